@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Script para comparar duas publicações mensais do arquivo CSV de preços
+de medicamentos sem carregá-las no banco de dados
+"""
+
+import csv
+import heapq
+import os
+import sys
+import tempfile
+from contextlib import ExitStack
+from decimal import Decimal, InvalidOperation
+from itertools import groupby
+
+
+# Colunas de preço no layout do CSV (mesmos índices usados em import_data.py)
+ALIQUOTAS_COLUNAS = [
+    'Sem Impostos', '0%',
+    '12%', '12% ALC', '17%', '17% ALC', '17.5%', '17.5% ALC',
+    '18%', '18% ALC', '19%', '19% ALC', '19.5%', '19.5% ALC',
+    '20%', '20% ALC', '20.5%', '20.5% ALC', '21%', '21% ALC',
+    '22%', '22% ALC', '22.5%', '22.5% ALC', '23%', '23% ALC',
+]
+COLUNAS_PRECO = (
+    [(13 + i, 'PF', f'PF {descricao}') for i, descricao in enumerate(ALIQUOTAS_COLUNAS)] +
+    [(39 + i, 'PMVG', f'PMVG {descricao}') for i, descricao in enumerate(ALIQUOTAS_COLUNAS)]
+)
+
+# Demais colunas carregadas pelo ETL em produtos (mesmos índices de processar_linha_csv)
+COLUNAS_CADASTRO = [
+    (0, 'substancia'), (1, 'cnpj'), (2, 'laboratorio'), (4, 'registro'),
+    (5, 'ean_1'), (6, 'ean_2'), (7, 'ean_3'), (8, 'produto'), (9, 'apresentacao'),
+    (10, 'classe_terapeutica'), (11, 'tipo_produto'), (12, 'regime_preco'),
+    (65, 'restricao_hospitalar'), (66, 'cap'), (67, 'confaz_87'), (68, 'icms_zero'),
+    (69, 'analise_recursal'), (70, 'lista_concessao_credito'), (71, 'comercializacao_2024'),
+    (72, 'tarja'),
+]
+
+IDX_CODIGO_GGREM = 3
+LIMITE_VARIACAO = Decimal('50')
+
+
+def limpar_valor_numerico(valor):
+    """Converte string numérica para Decimal, tratando vírgulas e valores vazios"""
+    # Espelha MedicamentosETL.limpar_valor_numerico (import_data.py); manter em sincronia
+    if not valor or valor.strip() == '' or valor.strip() == '-':
+        return None
+
+    # Remove espaços e substitui vírgula por ponto
+    valor_limpo = valor.strip().replace(',', '.')
+
+    try:
+        return Decimal(valor_limpo)
+    except (InvalidOperation, ValueError):
+        return None
+
+
+class ComparadorPrecos:
+    """Classe para comparar duas publicações do CSV por código GGREM"""
+
+    def __init__(self, csv_anterior, csv_novo, pular_linhas=72, linhas_por_bloco=10000,
+                 max_blocos_abertos=64, dir_temp=None):
+        """
+        Inicializa o comparador
+
+        Args:
+            csv_anterior: Caminho do CSV da publicação anterior
+            csv_novo: Caminho do CSV da publicação nova
+            pular_linhas: Número de linhas de cabeçalho em cada arquivo
+            linhas_por_bloco: Máximo de linhas mantidas em memória durante a ordenação
+            max_blocos_abertos: Máximo de blocos intercalados de uma vez (fan-in) por arquivo
+            dir_temp: Diretório para os arquivos temporários da ordenação externa
+        """
+        self.csv_anterior = csv_anterior
+        self.csv_novo = csv_novo
+        self.pular_linhas = pular_linhas
+        self.linhas_por_bloco = linhas_por_bloco
+        self.max_blocos_abertos = max_blocos_abertos
+        self.dir_temp = dir_temp
+        self.cabecalho_novo = []
+
+    def ler_linhas(self, csv_file, cabecalho=None):
+        """
+        Lê as linhas de dados do CSV, ignorando as mesmas linhas que o ETL ignora
+
+        Args:
+            csv_file: Caminho para arquivo CSV
+            cabecalho: Lista onde guardar as linhas de cabeçalho (opcional)
+        """
+        with open(csv_file, 'r', encoding='utf-8', errors='ignore', newline='') as arquivo:
+            leitor = csv.reader(arquivo, delimiter=';')
+
+            # Pula linhas de cabeçalho
+            for _ in range(self.pular_linhas):
+                linha = next(leitor, None)
+                if linha is not None and cabecalho is not None:
+                    cabecalho.append(linha)
+
+            for linha in leitor:
+                if len(linha) < 10 or not linha[IDX_CODIGO_GGREM].strip():
+                    continue
+                yield linha
+
+    def gravar_bloco(self, bloco, diretorio):
+        """Ordena um bloco de linhas por código GGREM e grava em arquivo temporário"""
+        # sort é estável: linhas repetidas mantêm a ordem do arquivo
+        bloco.sort(key=lambda linha: linha[IDX_CODIGO_GGREM].strip())
+
+        fd, caminho = tempfile.mkstemp(suffix='.csv', dir=diretorio)
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as arquivo:
+            csv.writer(arquivo, delimiter=';').writerows(bloco)
+        return caminho
+
+    def intercalar_blocos(self, blocos):
+        """
+        Intercala blocos ordenados, mantendo abertos apenas os arquivos desses blocos
+
+        heapq.merge é estável: em códigos repetidos, linhas de blocos anteriores
+        vêm primeiro, preservando a ordem original do arquivo.
+        """
+        with ExitStack() as pilha:
+            leitores = [
+                csv.reader(pilha.enter_context(open(caminho, 'r', encoding='utf-8', newline='')), delimiter=';')
+                for caminho in blocos
+            ]
+            yield from heapq.merge(*leitores, key=lambda linha: linha[IDX_CODIGO_GGREM].strip())
+
+    def reduzir_blocos(self, blocos, diretorio):
+        """
+        Intercala blocos em passadas até restarem no máximo `max_blocos_abertos`
+
+        Cada passada junta grupos consecutivos de blocos em um novo bloco
+        intermediário, o que mantém a estabilidade da ordenação.
+        """
+        while len(blocos) > self.max_blocos_abertos:
+            reduzidos = []
+            for inicio in range(0, len(blocos), self.max_blocos_abertos):
+                grupo = blocos[inicio:inicio + self.max_blocos_abertos]
+                if len(grupo) == 1:
+                    reduzidos.append(grupo[0])
+                    continue
+
+                fd, caminho = tempfile.mkstemp(suffix='.csv', dir=diretorio)
+                with os.fdopen(fd, 'w', encoding='utf-8', newline='') as arquivo:
+                    csv.writer(arquivo, delimiter=';').writerows(self.intercalar_blocos(grupo))
+
+                for bloco in grupo:
+                    os.remove(bloco)
+                reduzidos.append(caminho)
+            blocos = reduzidos
+
+        return blocos
+
+    def ordenar_externamente(self, csv_file, diretorio, cabecalho=None):
+        """
+        Ordena o CSV por código GGREM com memória limitada (ordenação externa)
+
+        O arquivo é dividido em blocos de no máximo `linhas_por_bloco` linhas,
+        cada bloco é ordenado e gravado em disco, e os blocos são intercalados
+        com heapq.merge em passadas de no máximo `max_blocos_abertos` arquivos.
+
+        Returns:
+            Iterador de (codigo_ggrem, linha) em ordem de código. Para códigos
+            repetidos, retorna apenas a última ocorrência no arquivo. No ETL a
+            última ocorrência prevalece nos dados cadastrais, mas um preço vazio
+            ou zero não sobrescreve o preço de uma ocorrência anterior.
+        """
+        blocos = []
+        bloco = []
+
+        for linha in self.ler_linhas(csv_file, cabecalho):
+            bloco.append(linha)
+            if len(bloco) >= self.linhas_por_bloco:
+                blocos.append(self.gravar_bloco(bloco, diretorio))
+                bloco = []
+
+        if bloco:
+            blocos.append(self.gravar_bloco(bloco, diretorio))
+
+        blocos = self.reduzir_blocos(blocos, diretorio)
+        intercalado = self.intercalar_blocos(blocos)
+
+        try:
+            for codigo_ggrem, grupo in groupby(intercalado, key=lambda linha: linha[IDX_CODIGO_GGREM].strip()):
+                ultima = None
+                for ultima in grupo:
+                    pass
+                yield codigo_ggrem, ultima
+        finally:
+            # Fecha os arquivos dos blocos antes da remoção do diretório temporário
+            intercalado.close()
+
+    def comparar_precos(self, linha_anterior, linha_nova):
+        """
+        Compara as colunas de preço PF/PMVG de duas versões do mesmo produto
+
+        Returns:
+            list: Tuplas (coluna, tipo_preco, valor_anterior, valor_novo, variacao)
+                  para cada coluna cujo valor mudou
+        """
+        alteracoes = []
+
+        for idx, tipo_preco, coluna in COLUNAS_PRECO:
+            valor_anterior = limpar_valor_numerico(linha_anterior[idx]) if len(linha_anterior) > idx else None
+            valor_novo = limpar_valor_numerico(linha_nova[idx]) if len(linha_nova) > idx else None
+
+            if valor_anterior == valor_novo:
+                continue
+
+            variacao = None
+            if valor_anterior and valor_novo is not None:
+                variacao = abs((valor_novo - valor_anterior) / valor_anterior * 100)
+
+            alteracoes.append((coluna, tipo_preco, valor_anterior, valor_novo, variacao))
+
+        return alteracoes
+
+    def comparar_cadastro(self, linha_anterior, linha_nova):
+        """
+        Compara as colunas cadastrais (não preço) de duas versões do mesmo produto
+
+        Returns:
+            list: Tuplas (coluna, valor_anterior, valor_novo) para cada coluna que mudou
+        """
+        alteracoes = []
+
+        for idx, coluna in COLUNAS_CADASTRO:
+            valor_anterior = linha_anterior[idx].strip() if len(linha_anterior) > idx else ''
+            valor_novo = linha_nova[idx].strip() if len(linha_nova) > idx else ''
+
+            if valor_anterior != valor_novo:
+                alteracoes.append((coluna, valor_anterior, valor_novo))
+
+        return alteracoes
+
+    def comparar(self):
+        """
+        Faz o merge-join das duas publicações ordenadas por código GGREM
+
+        Yields:
+            Tuplas (status, codigo_ggrem, linha_nova, alteracoes, alteracoes_cadastro),
+            onde status é 'ADICIONADO', 'REMOVIDO', 'ALTERADO' (preço mudou) ou
+            'CADASTRO' (apenas colunas não preço mudaram)
+        """
+        self.cabecalho_novo = []
+
+        with tempfile.TemporaryDirectory(prefix='diff_precos_', dir=self.dir_temp) as diretorio:
+            anterior = self.ordenar_externamente(self.csv_anterior, diretorio)
+            novo = self.ordenar_externamente(self.csv_novo, diretorio, self.cabecalho_novo)
+
+            try:
+                yield from self.juntar(anterior, novo)
+            finally:
+                anterior.close()
+                novo.close()
+
+    def juntar(self, anterior, novo):
+        """Merge-join de dois iteradores de (codigo_ggrem, linha) ordenados por código"""
+        item_anterior = next(anterior, None)
+        item_novo = next(novo, None)
+
+        while item_anterior is not None or item_novo is not None:
+            if item_novo is None or (item_anterior is not None and item_anterior[0] < item_novo[0]):
+                codigo_ggrem, linha_anterior = item_anterior
+                yield 'REMOVIDO', codigo_ggrem, None, self.comparar_precos(linha_anterior, []), []
+                item_anterior = next(anterior, None)
+            elif item_anterior is None or item_novo[0] < item_anterior[0]:
+                codigo_ggrem, linha_nova = item_novo
+                yield 'ADICIONADO', codigo_ggrem, linha_nova, self.comparar_precos([], linha_nova), []
+                item_novo = next(novo, None)
+            else:
+                codigo_ggrem, linha_nova = item_novo
+                alteracoes = self.comparar_precos(item_anterior[1], linha_nova)
+                alteracoes_cadastro = self.comparar_cadastro(item_anterior[1], linha_nova)
+                if alteracoes:
+                    yield 'ALTERADO', codigo_ggrem, linha_nova, alteracoes, alteracoes_cadastro
+                elif alteracoes_cadastro:
+                    yield 'CADASTRO', codigo_ggrem, linha_nova, alteracoes, alteracoes_cadastro
+                item_anterior = next(anterior, None)
+                item_novo = next(novo, None)
+
+    def executar(self, arquivo_relatorio, arquivo_alteracoes=None):
+        """
+        Executa a comparação e grava os resultados
+
+        Args:
+            arquivo_relatorio: CSV com uma linha por coluna alterada, ou uma linha por
+                               produto adicionado/removido sem preços
+            arquivo_alteracoes: CSV no layout original contendo apenas os produtos
+                                adicionados ou alterados (preço ou cadastro), para
+                                importar com import_data.py
+        """
+        print(f"\nComparando {self.csv_anterior} -> {self.csv_novo}")
+        print(f"Pulando {self.pular_linhas} linhas de cabeçalho...\n")
+
+        totais = {'ADICIONADO': 0, 'REMOVIDO': 0, 'ALTERADO': 0, 'CADASTRO': 0}
+        avisos = 0
+
+        with open(arquivo_relatorio, 'w', encoding='utf-8', newline='') as relatorio:
+            escritor_relatorio = csv.writer(relatorio, delimiter=';')
+            escritor_relatorio.writerow([
+                'status', 'codigo_ggrem', 'tipo_preco', 'coluna',
+                'valor_anterior', 'valor_novo', 'variacao_percentual', 'aviso_variacao',
+                'aplicado_etl'
+            ])
+
+            saida = open(arquivo_alteracoes, 'w', encoding='utf-8', newline='') if arquivo_alteracoes else None
+            try:
+                escritor_saida = csv.writer(saida, delimiter=';') if saida else None
+                cabecalho_gravado = False
+
+                for status, codigo_ggrem, linha_nova, alteracoes, alteracoes_cadastro in self.comparar():
+                    totais[status] += 1
+                    # O ETL não remove produtos
+                    aplicado_produto = 'Não' if status == 'REMOVIDO' else 'Sim'
+
+                    # Garante ao menos uma linha por produto adicionado/removido
+                    if not alteracoes and not alteracoes_cadastro:
+                        escritor_relatorio.writerow([
+                            status, codigo_ggrem, '', '', '', '', '', 'Não', aplicado_produto
+                        ])
+
+                    for coluna, valor_anterior, valor_novo in alteracoes_cadastro:
+                        escritor_relatorio.writerow([
+                            status, codigo_ggrem, '', coluna, valor_anterior, valor_novo, '', 'Não', 'Sim'
+                        ])
+
+                    for coluna, tipo_preco, valor_anterior, valor_novo, variacao in alteracoes:
+                        # Mesma regra de atualizar_preco_produto: aviso de variação apenas para PF
+                        aviso = tipo_preco == 'PF' and variacao is not None and variacao > LIMITE_VARIACAO
+                        if aviso:
+                            avisos += 1
+                        # O ETL só grava preços não vazios e diferentes de zero
+                        aplicado = aplicado_produto == 'Sim' and bool(valor_novo)
+                        escritor_relatorio.writerow([
+                            status, codigo_ggrem, tipo_preco, coluna,
+                            valor_anterior if valor_anterior is not None else '',
+                            valor_novo if valor_novo is not None else '',
+                            f'{variacao:.2f}' if variacao is not None else '',
+                            'Sim' if aviso else 'Não',
+                            'Sim' if aplicado else 'Não'
+                        ])
+
+                    if escritor_saida and linha_nova is not None:
+                        # Cabeçalho só fica disponível depois que o arquivo novo foi lido
+                        if not cabecalho_gravado:
+                            escritor_saida.writerows(self.cabecalho_novo)
+                            cabecalho_gravado = True
+                        escritor_saida.writerow(linha_nova)
+
+                if escritor_saida and not cabecalho_gravado:
+                    escritor_saida.writerows(self.cabecalho_novo)
+            finally:
+                if saida:
+                    saida.close()
+
+        print(f"✓ Comparação concluída!")
+        print(f"  Produtos adicionados: {totais['ADICIONADO']}")
+        print(f"  Produtos removidos: {totais['REMOVIDO']}")
+        print(f"  Produtos com preço alterado: {totais['ALTERADO']}")
+        print(f"  Produtos com apenas cadastro alterado: {totais['CADASTRO']}")
+        print(f"  Variações de PF acima de {LIMITE_VARIACAO}%: {avisos}")
+        print(f"  Relatório gravado em: {arquivo_relatorio}")
+        if arquivo_alteracoes:
+            print(f"  Conjunto de alterações gravado em: {arquivo_alteracoes}")
+
+        return totais
+
+
+def main():
+    """Função principal"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Compara os preços de duas publicações do CSV de medicamentos')
+    parser.add_argument('anterior', help='Arquivo CSV da publicação anterior')
+    parser.add_argument('novo', help='Arquivo CSV da publicação nova')
+    parser.add_argument('--skip', type=int, default=72, help='Número de linhas a pular (cabeçalho)')
+    parser.add_argument('--relatorio', default='diff_precos.csv', help='Arquivo CSV do relatório de diferenças')
+    parser.add_argument('--alteracoes', help='Arquivo CSV com apenas os produtos adicionados ou com preço/cadastro alterado (layout original)')
+    parser.add_argument('--bloco', type=int, default=10000,
+                        help='Linhas em memória por bloco da ordenação externa (~50 MB a cada 10000 linhas)')
+    parser.add_argument('--fanin', type=int, default=64,
+                        help='Máximo de blocos abertos por passada de intercalação (por arquivo)')
+    parser.add_argument('--tmpdir', help='Diretório para arquivos temporários')
+
+    args = parser.parse_args()
+
+    if args.bloco < 1:
+        parser.error('--bloco deve ser maior que zero')
+    if args.fanin < 2:
+        parser.error('--fanin deve ser pelo menos 2')
+
+    comparador = ComparadorPrecos(args.anterior, args.novo, pular_linhas=args.skip,
+                                  linhas_por_bloco=args.bloco, max_blocos_abertos=args.fanin,
+                                  dir_temp=args.tmpdir)
+
+    try:
+        comparador.executar(args.relatorio, args.alteracoes)
+    except OSError as e:
+        print(f"✗ Erro ao comparar arquivos: {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()